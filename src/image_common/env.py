@@ -2,93 +2,107 @@
 
 from __future__ import annotations
 
+import functools
 import os
+import re
 from pathlib import Path
-from typing import Any
-
-CONFIG_REGISTRY: list[dict[str, Any]] = [
-    {
-        "key": "FAL_KEY",
-        "default_value": '"<add fal.ai api key here>"',
-        "help_text": "Generate a fal.ai API key and put it here.",
-    },
-    {
-        "key": "SAFETENSORS_URL",
-        "default_value": '"https://example.com/safetensors_for_lora"',
-        "help_text": (
-            "If you have your own local web server for .safetensor files for lora, "
-            "profile the base URL here."
-        ),
-    },
-    {
-        "key": "SOURCE_IMAGE_URL",
-        "default_value": '"https://example.com/images_for_edit"',
-        "help_text": (
-            "Optional base URL for source images if using a local web server."
-        ),
-    },
-    {
-        "key": "MAX_CONTENT_LENGTH",
-        "default_value": "104857600",
-        "help_text": "imageedit uses this as the max allowed file upload length (100 MB).",
-    },
-    {
-        "key": "STARTUP_MODEL",
-        "default_value": "seedream",
-        "help_text": "imageedit startup model (must match a registry key).",
-    },
-    {
-        "key": "API_AUTH_ENABLED",
-        "default_value": "false",
-        "help_text": "Enable API token auth for imageedit (/api/* routes).",
-    },
-    {
-        "key": "API_TOKEN_SECRET",
-        "default_value": '"<set api token secret>"',  # noqa: S105
-        "help_text": "Secret used to sign and verify imageedit API tokens.",
-    },
-    {
-        "key": "API_TOKEN_TTL_SECONDS",
-        "default_value": "86400",
-        "help_text": "Lifetime for issued imageedit API tokens.",
-    },
-    {
-        "key": "SAVE_CLEAN_COPY",
-        "default_value": "on",
-        "help_text": (
-            "Create a second copy of the image in assets_cleans sans exif data."
-        ),
-    },
-    {
-        "key": "LOG_LEVEL",
-        "default_value": "INFO",
-        "help_text": "Logging level for stdout logging.",
-    },
-    {
-        "key": "LOG_FORMAT",
-        "default_value": '"%(asctime)s %(levelname)s %(name)s:%(filename)s:%(lineno)d: %(message)s"',
-        "help_text": "Logging format for stdout logging.",
-    },
-]
-
-
-def ensure_env_file(env_path: Path | None = None) -> None:
+
+_PAIR_RE = re.compile(
+    rb"(?m)^[ \t]*(?:export[ \t]+)?([A-Za-z_][A-Za-z0-9_]*)[ \t]*=(.*)$"
+)
+
+_BOOL_MAP: dict[str, bool] = {
+    "1": True,
+    "true": True,
+    "yes": True,
+    "on": True,
+    "0": False,
+    "false": False,
+    "no": False,
+    "off": False,
+}
+
+# key -> (default value, help text), in the order entries appear in .env.
+CONFIG_REGISTRY: dict[str, tuple[str, str]] = {
+    "FAL_KEY": (
+        '"<add fal.ai api key here>"',
+        "Generate a fal.ai API key and put it here.",
+    ),
+    "SAFETENSORS_URL": (
+        '"https://example.com/safetensors_for_lora"',
+        "If you have your own local web server for .safetensor files for lora, "
+        "profile the base URL here.",
+    ),
+    "SOURCE_IMAGE_URL": (
+        '"https://example.com/images_for_edit"',
+        "Optional base URL for source images if using a local web server.",
+    ),
+    "MAX_CONTENT_LENGTH": (
+        "104857600",
+        "imageedit uses this as the max allowed file upload length (100 MB).",
+    ),
+    "STARTUP_MODEL": (
+        "seedream",
+        "imageedit startup model (must match a registry key).",
+    ),
+    "API_AUTH_ENABLED": (
+        "false",
+        "Enable API token auth for imageedit (/api/* routes).",
+    ),
+    "API_TOKEN_SECRET": (
+        '"<set api token secret>"',  # noqa: S105
+        "Secret used to sign and verify imageedit API tokens.",
+    ),
+    "API_TOKEN_TTL_SECONDS": (
+        "86400",
+        "Lifetime for issued imageedit API tokens.",
+    ),
+    "SAVE_CLEAN_COPY": (
+        "on",
+        "Create a second copy of the image in assets_cleans sans exif data.",
+    ),
+    "LOG_LEVEL": (
+        "INFO",
+        "Logging level for stdout logging.",
+    ),
+    "LOG_FORMAT": (
+        '"%(asctime)s %(levelname)s %(name)s:%(filename)s:%(lineno)d: %(message)s"',
+        "Logging format for stdout logging.",
+    ),
+}
+
+
+def _clean_env_value(raw_value: str) -> str:
+    """Drop an unquoted trailing comment, matching load_dotenv's parsing."""
+    value = raw_value.strip()
+    if value.startswith(("'", '"')):
+        closing = value.find(value[0], 1)
+        if closing != -1:
+            return value[: closing + 1]
+        return value
+    if value.startswith("#"):
+        return ""
+    comment = re.search(r"[ \t]#", value)
+    if comment:
+        return value[: comment.start()].rstrip()
+    return value
+
+
+def ensure_env_file(env_path: Path | None = None) -> dict[str, str]:
     target = env_path or Path(".env")
-    existing_keys: set[str] = set()
-    content = ""
-    if target.exists():
-        content = target.read_text(encoding="utf-8")
-        for line in content.splitlines():
-            stripped = line.strip()
-            if not stripped or stripped.startswith("#") or "=" not in stripped:
-                continue
-            key = stripped.split("=", 1)[0].strip()
-            if key:
-                existing_keys.add(key)
-
-    missing = [entry for entry in CONFIG_REGISTRY if entry["key"] not in existing_keys]
+    try:
+        data = target.read_bytes()
+    except FileNotFoundError:
+        data = b""
+    content = data.decode("utf-8")
+    pairs: dict[str, str] = {
+        key.decode("ascii"): _clean_env_value(value.decode("utf-8"))
+        for key, value in _PAIR_RE.findall(data)
+    }
+
+    missing = [key for key in CONFIG_REGISTRY if key not in pairs]
     if not missing:
-        return
+        return pairs
 
     lines: list[str] = []
     if not content:
@@ -100,17 +114,16 @@ def ensure_env_file(env_path: Path | None = None) -> None:
         lines.append("")
         lines.append("# Added by imagegen to ensure required settings exist.")
 
-    for entry in missing:
-        help_text = str(entry["help_text"])
+    for key in missing:
+        default_value, help_text = CONFIG_REGISTRY[key]
         for help_line in help_text.splitlines():
             lines.append(f"# {help_line}")
-        lines.append(f"{entry['key']}={entry['default_value']}")
+        lines.append(f"{key}={default_value}")
         lines.append("")
+        pairs[key] = default_value
 
-    if target.exists():
-        target.write_text(content + "\n".join(lines), encoding="utf-8")
-    else:
-        target.write_text("\n".join(lines), encoding="utf-8")
+    target.write_text(content + "\n".join(lines), encoding="utf-8")
+    return pairs
 
 
 def load_env_file(env_path: Path | None = None) -> Path:
@@ -119,6 +132,18 @@ def load_env_file(env_path: Path | None = None) -> Path:
     return target
 
 
+def load_env(env_path: Path | None = None) -> Path:
+    """Ensure the .env file exists and push its values into os.environ.
+
+    Values already present in the environment win, matching load_dotenv's
+    default behaviour, but the file is only opened once.
+    """
+    target = env_path or Path(".env")
+    for key, value in ensure_env_file(target).items():
+        os.environ.setdefault(key, strip_env_quotes(value))
+    return target
+
+
 def read_env_values(env_path: Path) -> dict[str, str]:
     values: dict[str, str] = {}
     if not env_path.exists():
@@ -178,21 +203,23 @@ def is_placeholder_value(value: str) -> bool:
     return normalized.startswith("<") and normalized.endswith(">")
 
 
-def save_clean_copy_enabled() -> bool:
-    value = os.getenv("SAVE_CLEAN_COPY", "")
+@functools.lru_cache(maxsize=8)
+def _parse_save_clean_copy(value: str) -> bool:
     if not value.strip():
         return False
     return as_boolean(value, key="SAVE_CLEAN_COPY")
 
 
+def save_clean_copy_enabled() -> bool:
+    return _parse_save_clean_copy(os.getenv("SAVE_CLEAN_COPY", ""))
+
+
 def as_boolean(value: str, *, key: str | None = None) -> bool:
     if not key:
         key = "key"
-    normalized = value.strip().lower()
-    if normalized in {"1", "true", "yes", "on"}:
-        return True
-    if normalized in {"0", "false", "no", "off"}:
-        return False
-    raise ValueError(
-        f"value {value} for {key} must be one of 1, 0, true, false, yes, no, on, off"
-    )
+    result = _BOOL_MAP.get(value.strip().lower())
+    if result is None:
+        raise ValueError(
+            f"value {value} for {key} must be one of 1, 0, true, false, yes, no, on, off"
+        )
+    return result
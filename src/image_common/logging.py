@@ -6,8 +6,13 @@ import logging
 import os
 import sys
 
+_configured = False
 
-def configure_logging() -> None:
+
+def configure_logging(*, force: bool = False) -> None:
+    global _configured
+    if _configured and not force:
+        return
     level_name = os.getenv("LOG_LEVEL", "INFO").upper()
     log_format = os.getenv(
         "LOG_FORMAT",
@@ -26,3 +31,4 @@ def configure_logging() -> None:
     )
     httpx_level = logging.WARNING if os.getenv("PYTEST_CURRENT_TEST") else logging.DEBUG
     logging.getLogger("httpx").setLevel(httpx_level)
+    _configured = True
@@ -6,10 +6,7 @@ from pathlib import Path
 
 
 def list_prompt_names(prompts_dir: Path) -> list[str]:
-    names: list[str] = []
-    for path in prompts_dir.glob("*.txt"):
-        names.append(path.stem)
-    return sorted(names)
+    return sorted(path.stem for path in prompts_dir.glob("*.txt"))
 
 
 def prompt_path(prompts_dir: Path, prompt_name: str) -> Path:
@@ -27,9 +24,12 @@ def normalize_prompt_name(raw_name: str) -> str:
     return candidate
 
 
+def normalize_prompt_text(text: str) -> str:
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
 def write_prompt(path: Path, text: str) -> None:
-    normalized = text.replace("\r\n", "\n").replace("\r", "\n")
-    path.write_text(normalized, encoding="utf-8")
+    path.write_text(normalize_prompt_text(text), encoding="utf-8")
 
 
 def read_prompt(path: Path) -> str:
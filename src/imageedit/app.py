@@ -5,16 +5,15 @@ from __future__ import annotations
 import logging
 import os
 import secrets
-import threading
 from pathlib import Path
 from typing import Any
 
 import click
-from dotenv import load_dotenv
 from flask import Flask
 
 from image_common.env import (
     is_placeholder_value,
+    load_env,
     load_env_file,
     read_env_values,
     save_clean_copy_enabled,
@@ -33,14 +32,15 @@ from .routes import bp as routes_bp
 from .services.assets import prompt_name_from_asset_filename
 from .services.prompts import next_copy_name
 
+_VALID_MODELS = frozenset(MODEL_REGISTRY)
+_VALID_MODELS_DISPLAY = ", ".join(sorted(_VALID_MODELS))
+
 
 def create_app(*, config: dict[str, Any] | None = None) -> Flask:
     """Create and configure the Flask application."""
 
-    env_path = load_env_file(Path(".env"))
-    load_dotenv(env_path)
+    load_env(Path(".env"))
     configure_logging()
-    logger = logging.getLogger(__name__)
 
     app = Flask(__name__)
     app.config.from_mapping(
@@ -56,8 +56,6 @@ def create_app(*, config: dict[str, Any] | None = None) -> Flask:
     app.register_blueprint(routes_bp)
     _register_cli(app)
 
-    _start_prune_thread(app, logger)
-
     return app
 
 
@@ -88,10 +86,10 @@ def _register_cli(app: Flask) -> None:
 
 def _set_configs(app: Flask) -> None:
     startup_model = app.config.get("STARTUP_MODEL") or os.getenv("STARTUP_MODEL", "")
-    if startup_model not in MODEL_REGISTRY:
-        valid = ", ".join(sorted(MODEL_REGISTRY.keys()))
+    if startup_model not in _VALID_MODELS:
         raise ValueError(
-            f"STARTUP_MODEL must be one of: {valid}. Current value: {startup_model!r}"
+            f"STARTUP_MODEL must be one of: {_VALID_MODELS_DISPLAY}. "
+            f"Current value: {startup_model!r}"
         )
     app.config["STARTUP_MODEL"] = startup_model
 
@@ -131,24 +129,6 @@ def _as_bool(value: object) -> bool:
     return str(value).strip().lower() not in {"0", "false", "no", "off"}
 
 
-def _start_prune_thread(app: Flask, logger: logging.Logger) -> None:
-    if app.config.get("TESTING"):
-        return
-
-    from .services.uploads import prune_upload_history
-
-    def _prune() -> None:
-        with app.app_context():
-            try:
-                prune_upload_history()
-            except Exception:
-                # Avoid breaking startup if pruning fails.
-                logger.warning("Upload history prune failed.", exc_info=True)
-                return
-
-    threading.Thread(target=_prune, daemon=True).start()
-
-
 def _init_storage_dirs(app: Flask) -> None:
     prompts_dir = Path(app.config["PROMPTS_DIR"])
     styles_dir = Path(app.config["STYLES_DIR"])
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import functools
 from collections.abc import Sequence
 from typing import Any
 
@@ -30,6 +31,7 @@ def default_size_option(model: str) -> str:
     return str(default)
 
 
+@functools.lru_cache(maxsize=64)
 def default_option(model: str, option_name: str) -> str:
     model_info = MODEL_REGISTRY.get(model, {})
     options = model_info.get("options", {})
@@ -40,6 +42,7 @@ def default_option(model: str, option_name: str) -> str:
     return str(default)
 
 
+@functools.lru_cache(maxsize=64)
 def get_allowed_sizes(model: str) -> list[str]:
     _, spec = size_option_spec(model)
     allowed = spec.get("allowed_sizes") if spec else None
@@ -48,12 +51,7 @@ def get_allowed_sizes(model: str) -> list[str]:
     return sorted(str(value) for value in allowed)
 
 
-def model_supports_image_urls(model: str) -> bool:
-    return image_input_mode(model) != "none"
-
-
-def image_input_mode(model: str) -> str:
-    model_info = MODEL_REGISTRY.get(model, {})
+def _compute_image_input_mode(model_info: dict[str, Any]) -> str:
     options = model_info.get("options", {})
     if "image_urls" in options:
         return "multi"
@@ -62,6 +60,24 @@ def image_input_mode(model: str) -> str:
     return "none"
 
 
+# The registry is immutable after import, so both lookups are precomputed.
+_IMAGE_INPUT_MODES: dict[str, str] = {
+    name: _compute_image_input_mode(model_info)
+    for name, model_info in MODEL_REGISTRY.items()
+}
+_SUPPORTS_IMAGE_URLS = frozenset(
+    name for name, mode in _IMAGE_INPUT_MODES.items() if mode != "none"
+)
+
+
+def model_supports_image_urls(model: str) -> bool:
+    return model in _SUPPORTS_IMAGE_URLS
+
+
+def image_input_mode(model: str) -> str:
+    return _IMAGE_INPUT_MODES.get(model, "none")
+
+
 def parse_checkbox(values: Sequence[str], *, default: bool = False) -> bool:
     if not values:
         return default
@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+import functools
+import itertools
+import json
 import logging
 import os
 from pathlib import Path
@@ -20,6 +23,7 @@ from image_common.exif import extract_prompt_from_exif
 from image_common.prompts import (
     list_prompt_names,
     normalize_prompt_name,
+    normalize_prompt_text,
     prompt_path,
     read_prompt,
     write_prompt,
@@ -53,6 +57,8 @@ ALL_MODELS = sorted(MODEL_REGISTRY.keys())
 _DISALLOWED_NAME_CHARS = {os.sep}
 if os.altsep:
     _DISALLOWED_NAME_CHARS.add(os.altsep)
+# Deletes every disallowed character, so a changed string means a bad name.
+_DISALLOWED_NAME_TRANS = str.maketrans("", "", "".join(_DISALLOWED_NAME_CHARS) + ".")
 logger = logging.getLogger(__name__)
 
 
@@ -64,16 +70,30 @@ def _require_api_token():
         return None
     token = _get_api_token()
     if not token:
-        return jsonify({"error": "Missing API token"}), 401
+        return _error_response("Missing API token", 401)
 
     secret = current_app.config["API_TOKEN_SECRET"]
     max_age = current_app.config["API_TOKEN_TTL_SECONDS"]
     _, error = verify_api_token(token, secret, max_age=max_age)
     if error:
-        return jsonify({"error": "Invalid API token"}), 401
+        return _error_response("Invalid API token", 401)
     return None
 
 
+@functools.lru_cache(maxsize=32)
+def _error_body(message: str) -> str:
+    return json.dumps({"error": message}, separators=(",", ":"))
+
+
+def _error_response(message: str, status: int):
+    """Build an error response from a cached body, skipping jsonify."""
+    response = current_app.response_class(
+        _error_body(message), mimetype="application/json"
+    )
+    response.status_code = status
+    return response
+
+
 def _get_api_token() -> str | None:
     auth_header = request.headers.get("Authorization", "")
     if auth_header.startswith("Bearer "):
@@ -87,9 +107,7 @@ def _validate_plain_name(raw_name: str) -> str | None:
         return None
     if name.startswith("."):
         return None
-    if any(ch in name for ch in _DISALLOWED_NAME_CHARS):
-        return None
-    if "." in name:
+    if name.translate(_DISALLOWED_NAME_TRANS) != name:
         return None
     return name
 
@@ -288,11 +306,11 @@ def api_upload_asset():
     """Upload a previously generated asset to fal cloud."""
     data = request.json
     if not data or "filename" not in data:
-        return jsonify({"error": "Missing filename"}), 400
+        return _error_response("Missing filename", 400)
 
     filename = data["filename"]
     if ".." in filename or filename.startswith("/"):
-        return jsonify({"error": "Invalid filename"}), 400
+        return _error_response("Invalid filename", 400)
 
     assets_dir = Path(current_app.config["ASSETS_DIR"])
     asset_path = resolve_asset_path(assets_dir, filename)
@@ -319,7 +337,7 @@ def api_upload():
     """Handle local image upload to fal cloud."""
 
     if "file" not in request.files:
-        return {"error": "No file provided"}, 400
+        return _error_response("No file provided", 400)
 
     file = request.files["file"]
     filename = file.filename or "unknown"
@@ -347,21 +365,28 @@ def api_get_upload_history():
     return jsonify(get_upload_history())
 
 
+def _model_sizes_payload(model: str) -> str:
+    return json.dumps(
+        {
+            "sizes": get_allowed_sizes(model),
+            "default": default_option(model, "image_size"),
+            "supports_image_urls": model_supports_image_urls(model),
+            "image_input_mode": image_input_mode(model),
+        },
+        separators=(",", ":"),
+    )
+
+
+# The registry is immutable after import, so each response body is static.
+_MODEL_SIZES_JSON = {model: _model_sizes_payload(model) for model in MODEL_REGISTRY}
+_UNKNOWN_MODEL_SIZES_JSON = _model_sizes_payload("")
+
+
 @bp.route("/api/model-sizes/<model>")
 def api_model_sizes(model: str):
     """Return allowed sizes for a given model as JSON."""
-    sizes = get_allowed_sizes(model)
-    default = default_option(model, "image_size")
-    supports_urls = model_supports_image_urls(model)
-    input_mode = image_input_mode(model)
-    return jsonify(
-        {
-            "sizes": sizes,
-            "default": default,
-            "supports_image_urls": supports_urls,
-            "image_input_mode": input_mode,
-        }
-    )
+    payload = _MODEL_SIZES_JSON.get(model, _UNKNOWN_MODEL_SIZES_JSON)
+    return current_app.response_class(payload, mimetype="application/json")
 
 
 @bp.route("/api/prompt/<name>")
@@ -369,7 +394,7 @@ def api_get_prompt(name: str):
     """Return prompt text for a given prompt name."""
     validated = _validate_plain_name(name)
     if not validated:
-        return jsonify({"error": "Invalid prompt name"}), 400
+        return _error_response("Invalid prompt name", 400)
     prompts_dir = Path(current_app.config["PROMPTS_DIR"])
     prompt_file = prompt_path(prompts_dir, validated)
     if prompt_file.exists():
@@ -383,7 +408,7 @@ def api_get_style(name: str):
     """Return style text for a given style name."""
     validated = _validate_plain_name(name)
     if not validated:
-        return jsonify({"error": "Invalid style name"}), 400
+        return _error_response("Invalid style name", 400)
     styles_dir = Path(current_app.config["STYLES_DIR"])
     style_path = prompt_path(styles_dir, validated)
     if style_path.exists():
@@ -397,28 +422,31 @@ def api_save_style():
     """Save a new style, handling naming collisions."""
     data = request.json
     if not data or "name" not in data or "text" not in data:
-        return jsonify({"error": "Missing name or text"}), 400
+        return _error_response("Missing name or text", 400)
 
     name = data["name"]
     text = data["text"]
     validated = _validate_plain_name(name)
     if not validated:
-        return jsonify({"error": "Style name cannot be empty"}), 400
+        return _error_response("Style name cannot be empty", 400)
 
     styles_dir = Path(current_app.config["STYLES_DIR"])
     styles_dir.mkdir(parents=True, exist_ok=True)
 
     base_name = normalize_prompt_name(validated)
-    counter = 0
-    while True:
-        candidate_name = base_name if counter == 0 else f"{base_name}_{counter}"
-        style_path = styles_dir / f"{candidate_name}.txt"
-        if not style_path.exists():
-            break
-        counter += 1
-
     try:
-        write_prompt(style_path, text)
+        # O_CREAT|O_EXCL both probes and claims the name in one syscall, so
+        # concurrent saves cannot race a stale exists() check.
+        for counter in itertools.count():
+            candidate_name = base_name if counter == 0 else f"{base_name}_{counter}"
+            style_path = styles_dir / f"{candidate_name}.txt"
+            try:
+                fd = os.open(style_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                break
+            except FileExistsError:
+                continue
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(normalize_prompt_text(text))
         return jsonify({"success": True, "saved_name": candidate_name})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -429,12 +457,12 @@ def api_delete_style():
     """Delete an existing style."""
     data = request.json
     if not data or "name" not in data:
-        return jsonify({"error": "Missing name"}), 400
+        return _error_response("Missing name", 400)
 
     name = data["name"]
     validated = _validate_plain_name(name)
     if not validated:
-        return jsonify({"error": "Style name cannot be empty"}), 400
+        return _error_response("Style name cannot be empty", 400)
 
     styles_dir = Path(current_app.config["STYLES_DIR"])
     style_path = prompt_path(styles_dir, validated)
@@ -454,13 +482,13 @@ def api_save_prompt():
     """Save a prompt text with a given name."""
     data = request.json
     if not data or "name" not in data or "text" not in data:
-        return jsonify({"error": "Missing name or text"}), 400
+        return _error_response("Missing name or text", 400)
 
     name = data["name"]
     text = data["text"]
     validated = _validate_plain_name(name)
     if not validated:
-        return jsonify({"error": "Prompt name cannot be empty"}), 400
+        return _error_response("Prompt name cannot be empty", 400)
 
     prompts_dir = Path(current_app.config["PROMPTS_DIR"])
     prompts_dir.mkdir(parents=True, exist_ok=True)
@@ -480,12 +508,12 @@ def api_delete_prompt():
     """Delete an existing prompt."""
     data = request.json
     if not data or "name" not in data:
-        return jsonify({"error": "Missing name"}), 400
+        return _error_response("Missing name", 400)
 
     name = data["name"]
     validated = _validate_plain_name(name)
     if not validated:
-        return jsonify({"error": "Prompt name cannot be empty"}), 400
+        return _error_response("Prompt name cannot be empty", 400)
 
     prompts_dir = Path(current_app.config["PROMPTS_DIR"])
     prompt_file = prompt_path(prompts_dir, validated)
@@ -505,13 +533,13 @@ def api_duplicate_prompt():
     """Duplicate an existing prompt with an incremented name."""
     data = request.json
     if not data or "name" not in data or "text" not in data:
-        return jsonify({"error": "Missing name or text"}), 400
+        return _error_response("Missing name or text", 400)
 
     name = data["name"]
     text = data["text"]
     validated = _validate_plain_name(name)
     if not validated:
-        return jsonify({"error": "Prompt name cannot be empty"}), 400
+        return _error_response("Prompt name cannot be empty", 400)
 
     prompts_dir = Path(current_app.config["PROMPTS_DIR"])
     prompts_dir.mkdir(parents=True, exist_ok=True)
@@ -11,7 +11,7 @@ from image_common.prompts import split_multivalue_field
 from imagegen.imagegen import build_exif_description, generate_images_with_urls
 from imagegen.options import parse_args
 
-from .uploads import log_generated_images, log_generation_request, resolve_upload_ids
+from .uploads import log_generation_and_images, resolve_upload_ids
 
 
 def run_generation(
@@ -28,8 +28,9 @@ def run_generation(
     args: list[str] = [selected_model, "--no-preview", "-f", str(prompt_path)]
     if include_prompt_metadata:
         args.append("-a")
-    if image_size.strip():
-        args.extend(["-i", image_size.strip()])
+    stripped_size = image_size.strip()
+    if stripped_size:
+        args.extend(["-i", stripped_size])
     urls = split_multivalue_field(image_urls)
     if image_input_mode == "single":
         if len(urls) > 1:
@@ -44,11 +45,11 @@ def run_generation(
         for url in urls:
             args.extend(["-u", url])
 
-    meta = {
-        "prompt_name": prompt_name,
-        "style_name": style_name,
-    }
-    meta = {k: v for k, v in meta.items() if v}
+    meta: dict[str, str] = {}
+    if prompt_name:
+        meta["prompt_name"] = prompt_name
+    if style_name:
+        meta["style_name"] = style_name
     if meta:
         args.extend(["--meta", json.dumps(meta)])
 
@@ -76,7 +77,7 @@ def run_generation(
         image_size_value = parsed.params.get("aspect_ratio")
 
     upload_ids = resolve_upload_ids(urls)
-    request_id = log_generation_request(
+    log_generation_and_images(
         prompt=prompt_text,
         endpoint=parsed.endpoint,
         model=parsed.model,
@@ -86,10 +87,6 @@ def run_generation(
         upload_ids=upload_ids,
         generation_started_at=generation_started_at,
         generation_completed_at=generation_completed_at,
-    )
-
-    log_generated_images(
-        request_id=request_id,
         images=[
             (path.name, url) for path, url in zip(paths, download_urls, strict=False)
         ],
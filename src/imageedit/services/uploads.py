@@ -2,12 +2,15 @@
 
 from __future__ import annotations
 
-import concurrent.futures
-import json
+import asyncio
+import atexit
+import functools
+import io
 import sqlite3
-import tempfile
+import threading
 import time
-from collections.abc import Callable
+import uuid
+from collections.abc import Callable, Iterable
 from pathlib import Path
 from typing import Protocol
 
@@ -15,7 +18,7 @@ import httpx
 from flask import current_app
 from PIL import Image
 
-from imagegen.imagegen import upload_image
+from imagegen.imagegen import upload_image_bytes
 
 
 class _HeadClient(Protocol):
@@ -23,19 +26,19 @@ class _HeadClient(Protocol):
 
 
 def _strip_exif_and_upload(image: Image.Image, filename: str) -> str:
-    """Save an image to a temporary file without EXIF data and upload it."""
-    suffix = Path(filename).suffix
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir) / f"upload{suffix}"
+    """Re-encode an image in memory without EXIF data and upload it."""
+    suffix = Path(filename).suffix.lower()
+    image_format = image.format or Image.registered_extensions().get(suffix, "PNG")
 
-        # Create a clean copy without metadata
-        clean_img = image.copy()
+    # Create a clean copy without metadata
+    clean_img = image.copy()
 
-        if "exif" in clean_img.info:
-            del clean_img.info["exif"]
+    if "exif" in clean_img.info:
+        del clean_img.info["exif"]
 
-        clean_img.save(temp_path)
-        return upload_image(temp_path)
+    buffer = io.BytesIO()
+    clean_img.save(buffer, format=image_format)
+    return upload_image_bytes(buffer.getvalue(), filename)
 
 
 def upload_local_image(file) -> str:
@@ -53,25 +56,42 @@ def upload_asset_image(asset_path: Path) -> str:
         return _strip_exif_and_upload(img, asset_path.name)
 
 
-def _resolve_db_path(db_path: Path | None) -> Path:
-    if db_path is not None:
-        return db_path
-    assets_dir = Path(current_app.config["ASSETS_DIR"])
+@functools.lru_cache(maxsize=4)
+def _resolve_assets_dir(assets_dir_str: str) -> Path:
+    assets_dir = Path(assets_dir_str)
     if not assets_dir.is_absolute():
         assets_dir = (Path.cwd() / assets_dir).resolve()
+    return assets_dir
+
+
+def _resolve_db_path(db_path: Path | str | None) -> Path | str:
+    if db_path is not None:
+        return db_path
+    if current_app.config.get("SQLITE_MEMORY"):
+        uri = current_app.config.get("SQLITE_MEMORY_URI")
+        if uri is None:
+            token = uuid.uuid4().hex
+            uri = f"file:imageedit-{token}?mode=memory&cache=shared"
+            current_app.config["SQLITE_MEMORY_URI"] = uri
+        return uri
+    assets_dir = _resolve_assets_dir(str(current_app.config["ASSETS_DIR"]))
     return assets_dir / "imageedit.sqlite3"
 
 
+def _db_missing(db_path: Path | str) -> bool:
+    return isinstance(db_path, Path) and not db_path.exists()
+
+
 def _ensure_schema(connection: sqlite3.Connection) -> None:
     connection.executescript(
         """
-        PRAGMA foreign_keys = ON;
-
         CREATE TABLE IF NOT EXISTS uploaded_images (
             upload_id INTEGER PRIMARY KEY AUTOINCREMENT,
             filename TEXT NOT NULL,
             uploaded_at REAL NOT NULL,
-            url TEXT NOT NULL
+            url TEXT NOT NULL,
+            last_checked REAL NOT NULL DEFAULT 0,
+            alive INTEGER NOT NULL DEFAULT 1
         );
 
         CREATE TABLE IF NOT EXISTS generation_requests (
@@ -94,18 +114,76 @@ def _ensure_schema(connection: sqlite3.Connection) -> None:
             image_download_url TEXT NOT NULL,
             FOREIGN KEY (request_id) REFERENCES generation_requests(request_id) ON DELETE CASCADE
         );
+
+        CREATE TABLE IF NOT EXISTS request_uploads (
+            request_id INTEGER NOT NULL,
+            upload_id INTEGER NOT NULL,
+            FOREIGN KEY (request_id) REFERENCES generation_requests(request_id) ON DELETE CASCADE
+        );
         """
     )
+    # Databases created before lazy revalidation lack the bookkeeping columns.
+    for column_ddl in (
+        "last_checked REAL NOT NULL DEFAULT 0",
+        "alive INTEGER NOT NULL DEFAULT 1",
+    ):
+        try:
+            connection.execute(f"ALTER TABLE uploaded_images ADD COLUMN {column_ddl}")
+        except sqlite3.OperationalError:
+            pass
 
 
-def _connect_db(db_path: Path | None = None) -> sqlite3.Connection:
+_local = threading.local()
+_schema_done: set[Path | str] = set()
+_all_connections: list[sqlite3.Connection] = []
+_all_connections_lock = threading.Lock()
+
+
+@atexit.register
+def _close_cached_connections() -> None:
+    with _all_connections_lock:
+        for connection in _all_connections:
+            try:
+                connection.close()
+            except sqlite3.ProgrammingError:
+                # Connections owned by other threads cannot be closed here.
+                pass
+        _all_connections.clear()
+
+
+def _connect_db(db_path: Path | str | None = None) -> sqlite3.Connection:
     db_path = _resolve_db_path(db_path)
-    connection = sqlite3.connect(db_path)
-    connection.row_factory = sqlite3.Row
-    _ensure_schema(connection)
+    connections: dict[Path | str, sqlite3.Connection] | None = getattr(
+        _local, "connections", None
+    )
+    if connections is None:
+        connections = _local.connections = {}
+    connection = connections.get(db_path)
+    if connection is None:
+        if isinstance(db_path, Path):
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(db_path, uri=isinstance(db_path, str))
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA temp_store = MEMORY")
+        connection.execute("PRAGMA cache_size = -8000")
+        connections[db_path] = connection
+        with _all_connections_lock:
+            _all_connections.append(connection)
+    if db_path not in _schema_done:
+        _ensure_schema(connection)
+        _schema_done.add(db_path)
     return connection
 
 
+_INSERT_UPLOAD_SQL = """
+    INSERT INTO uploaded_images (filename, uploaded_at, url, last_checked)
+    VALUES (?, ?, ?, ?)
+"""
+
+
 def save_upload_to_history(
     url: str,
     filename: str,
@@ -114,27 +192,79 @@ def save_upload_to_history(
     time_func: Callable[[], float] = time.time,
 ) -> None:
     """Append a new upload entry to the history file."""
+    now = time_func()
     with _connect_db(db_path) as connection:
-        connection.execute(
-            """
-            INSERT INTO uploaded_images (filename, uploaded_at, url)
-            VALUES (?, ?, ?)
-            """,
-            (filename, time_func(), url),
+        connection.execute(_INSERT_UPLOAD_SQL, (filename, now, url, now))
+
+
+def save_uploads_to_history(
+    entries: Iterable[tuple[str, str]],
+    *,
+    db_path: Path | None = None,
+    time_func: Callable[[], float] = time.time,
+) -> None:
+    """Append several (url, filename) upload entries in one transaction."""
+    now = time_func()
+    rows = [(filename, now, url, now) for url, filename in entries]
+    if not rows:
+        return
+    with _connect_db(db_path) as connection:
+        connection.executemany(_INSERT_UPLOAD_SQL, rows)
+
+
+_REVALIDATE_TTL_SECONDS = 3600.0
+
+
+def _revalidate_stale_urls(
+    db_path: Path | str,
+    now: float,
+    http_client: _HeadClient | None,
+) -> None:
+    """Re-HEAD entries not checked within the TTL and record the outcome."""
+    cutoff = now - _REVALIDATE_TTL_SECONDS
+    with _connect_db(db_path) as connection:
+        rows = connection.execute(
+            "SELECT upload_id, url FROM uploaded_images WHERE last_checked < ?",
+            (cutoff,),
+        ).fetchall()
+    if not rows:
+        return
+
+    urls = [row["url"] for row in rows]
+    if http_client is not None:
+        results = [_head_ok(http_client, url) for url in urls]
+    else:
+        results = asyncio.run(_head_all(urls))
+
+    with _connect_db(db_path) as connection:
+        connection.executemany(
+            "UPDATE uploaded_images SET last_checked = ?, alive = ? WHERE upload_id = ?",
+            [
+                (now, int(is_valid), row["upload_id"])
+                for row, is_valid in zip(rows, results, strict=True)
+            ],
         )
 
 
-def get_upload_history(*, db_path: Path | None = None) -> list[dict]:
-    """Return the list of uploaded images."""
+def get_upload_history(
+    *,
+    db_path: Path | str | None = None,
+    http_client: _HeadClient | None = None,
+    time_func: Callable[[], float] = time.time,
+) -> list[dict]:
+    """Return the list of uploaded images whose URLs are still reachable."""
     db_path = _resolve_db_path(db_path)
-    if not db_path.exists():
+    if _db_missing(db_path):
         return []
 
+    _revalidate_stale_urls(db_path, time_func(), http_client)
+
     with _connect_db(db_path) as connection:
         rows = connection.execute(
             """
             SELECT filename, uploaded_at, url
             FROM uploaded_images
+            WHERE alive = 1
             ORDER BY upload_id DESC
             """
         ).fetchall()
@@ -149,14 +279,54 @@ def get_upload_history(*, db_path: Path | None = None) -> list[dict]:
     ]
 
 
+def count_upload_history(*, db_path: Path | str | None = None) -> int:
+    """Return the number of stored upload entries without fetching rows."""
+    db_path = _resolve_db_path(db_path)
+    if _db_missing(db_path):
+        return 0
+    with _connect_db(db_path) as connection:
+        return connection.execute("SELECT COUNT(*) FROM uploaded_images").fetchone()[0]
+
+
+def _head_ok(client: _HeadClient, url: str) -> bool:
+    if not url:
+        return False
+    try:
+        response = client.head(url, timeout=2.0)
+        return response.status_code < 400
+    except httpx.RequestError:
+        return False
+
+
+async def _head_all(urls: list[str]) -> list[bool]:
+    """HEAD every URL concurrently on pooled keep-alive connections."""
+    results = [False] * len(urls)
+    to_check = [(index, url) for index, url in enumerate(urls) if url]
+    if not to_check:
+        return results
+    limits = httpx.Limits(max_connections=20)
+    async with httpx.AsyncClient(limits=limits, timeout=2.0) as client:
+        responses = await asyncio.gather(
+            *(client.head(url) for _, url in to_check),
+            return_exceptions=True,
+        )
+    for (index, _), response in zip(to_check, responses, strict=True):
+        if isinstance(response, httpx.RequestError):
+            continue
+        if isinstance(response, BaseException):
+            raise response
+        results[index] = response.status_code < 400
+    return results
+
+
 def prune_upload_history(
     *,
-    db_path: Path | None = None,
+    db_path: Path | str | None = None,
     http_client: _HeadClient | None = None,
 ) -> None:
     """Check validity of all URLs in history and remove dead links."""
     db_path = _resolve_db_path(db_path)
-    if not db_path.exists():
+    if _db_missing(db_path):
         return
 
     with _connect_db(db_path) as connection:
@@ -166,25 +336,11 @@ def prune_upload_history(
     if not rows:
         return
 
-    def is_url_valid(entry: dict) -> bool:
-        url = entry.get("url")
-        if not url:
-            return False
-        try:
-            client = http_client or httpx
-            response = client.head(url, timeout=2.0)
-            return response.status_code < 400
-        except httpx.RequestError:
-            return False
-
-    # Check validity in parallel, preserving order
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(
-            executor.map(
-                is_url_valid,
-                ({"url": row["url"]} for row in rows),
-            )
-        )
+    urls = [row["url"] for row in rows]
+    if http_client is not None:
+        results = [_head_ok(http_client, url) for url in urls]
+    else:
+        results = asyncio.run(_head_all(urls))
 
     invalid_ids = [
         row["upload_id"]
@@ -193,28 +349,100 @@ def prune_upload_history(
     ]
 
     if invalid_ids:
+        placeholders = ", ".join("?" * len(invalid_ids))
         with _connect_db(db_path) as connection:
-            connection.executemany(
-                "DELETE FROM uploaded_images WHERE upload_id = ?",
-                [(upload_id,) for upload_id in invalid_ids],
+            connection.execute(
+                f"DELETE FROM uploaded_images WHERE upload_id IN ({placeholders})",  # noqa: S608
+                invalid_ids,
             )
 
 
 def resolve_upload_ids(urls: list[str], *, db_path: Path | None = None) -> list[int]:
     if not urls:
         return []
-    url_set = set(urls)
+    unique_urls = list(dict.fromkeys(urls))
+    placeholders = ", ".join("?" * len(unique_urls))
     with _connect_db(db_path) as connection:
         rows = connection.execute(
-            """
-            SELECT upload_id, url
-            FROM uploaded_images
-            """,
+            f"SELECT upload_id, url FROM uploaded_images WHERE url IN ({placeholders})",  # noqa: S608
+            unique_urls,
         ).fetchall()
-    id_by_url = {row["url"]: row["upload_id"] for row in rows if row["url"] in url_set}
+    id_by_url = {row["url"]: row["upload_id"] for row in rows}
     return [id_by_url[url] for url in urls if url in id_by_url]
 
 
+def _insert_generation_request(
+    connection: sqlite3.Connection,
+    *,
+    prompt: str,
+    endpoint: str,
+    model: str,
+    seed: int | None,
+    image_size: str | None,
+    prompt_json: str | None,
+    upload_ids: list[int],
+    generation_started_at: float,
+    generation_completed_at: float,
+) -> int:
+    cursor = connection.execute(
+        """
+        INSERT INTO generation_requests (
+            prompt,
+            endpoint,
+            model,
+            seed,
+            image_size,
+            prompt_json,
+            generation_started_at,
+            generation_completed_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            prompt,
+            endpoint,
+            model,
+            seed,
+            image_size,
+            prompt_json,
+            generation_started_at,
+            generation_completed_at,
+        ),
+    )
+    if cursor.lastrowid is None:
+        raise RuntimeError("Failed to insert generation request.")
+    request_id = int(cursor.lastrowid)
+    if upload_ids:
+        connection.executemany(
+            "INSERT INTO request_uploads (request_id, upload_id) VALUES (?, ?)",
+            [(request_id, upload_id) for upload_id in upload_ids],
+        )
+    return request_id
+
+
+_INSERT_IMAGE_SQL = """
+    INSERT INTO generated_images (
+        request_id,
+        image_filename,
+        image_download_url
+    )
+    VALUES (?, ?, ?)
+"""
+
+
+def _insert_generated_images(
+    connection: sqlite3.Connection,
+    request_id: int,
+    images: list[tuple[str, str]],
+) -> None:
+    if not images:
+        return
+    connection.executemany(
+        _INSERT_IMAGE_SQL,
+        [(request_id, filename, download_url) for filename, download_url in images],
+    )
+
+
 def log_generation_request(
     *,
     prompt: str,
@@ -228,38 +456,19 @@ def log_generation_request(
     generation_completed_at: float,
     db_path: Path | None = None,
 ) -> int:
-    upload_ids_json = json.dumps(upload_ids)
     with _connect_db(db_path) as connection:
-        cursor = connection.execute(
-            """
-            INSERT INTO generation_requests (
-                prompt,
-                endpoint,
-                model,
-                seed,
-                image_size,
-                prompt_json,
-                upload_ids_json,
-                generation_started_at,
-                generation_completed_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                prompt,
-                endpoint,
-                model,
-                seed,
-                image_size,
-                prompt_json,
-                upload_ids_json,
-                generation_started_at,
-                generation_completed_at,
-            ),
+        return _insert_generation_request(
+            connection,
+            prompt=prompt,
+            endpoint=endpoint,
+            model=model,
+            seed=seed,
+            image_size=image_size,
+            prompt_json=prompt_json,
+            upload_ids=upload_ids,
+            generation_started_at=generation_started_at,
+            generation_completed_at=generation_completed_at,
         )
-        if cursor.lastrowid is None:
-            raise RuntimeError("Failed to insert generation request.")
-        return int(cursor.lastrowid)
 
 
 def log_generated_images(
@@ -268,14 +477,36 @@ def log_generated_images(
     if not images:
         return
     with _connect_db(db_path) as connection:
-        connection.executemany(
-            """
-            INSERT INTO generated_images (
-                request_id,
-                image_filename,
-                image_download_url
-            )
-            VALUES (?, ?, ?)
-            """,
-            [(request_id, filename, download_url) for filename, download_url in images],
+        _insert_generated_images(connection, request_id, images)
+
+
+def log_generation_and_images(
+    *,
+    prompt: str,
+    endpoint: str,
+    model: str,
+    seed: int | None,
+    image_size: str | None,
+    prompt_json: str | None,
+    upload_ids: list[int],
+    generation_started_at: float,
+    generation_completed_at: float,
+    images: list[tuple[str, str]],
+    db_path: Path | None = None,
+) -> int:
+    """Log a generation request and its images in a single transaction."""
+    with _connect_db(db_path) as connection:
+        request_id = _insert_generation_request(
+            connection,
+            prompt=prompt,
+            endpoint=endpoint,
+            model=model,
+            seed=seed,
+            image_size=image_size,
+            prompt_json=prompt_json,
+            upload_ids=upload_ids,
+            generation_started_at=generation_started_at,
+            generation_completed_at=generation_completed_at,
         )
+        _insert_generated_images(connection, request_id, images)
+        return request_id
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import json
 import logging
+import mimetypes
 import subprocess
 import sys
 import time
@@ -385,6 +386,12 @@ def upload_image(path: Path) -> str:
     return url
 
 
+def upload_image_bytes(data: bytes, filename: str) -> str:
+    """Upload in-memory image bytes to fal storage and return the URL."""
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return fal_client.upload(data, content_type, file_name=filename)
+
+
 def _save_clean_copy(source_path: Path, output_dir: Path) -> None:
     """Save a copy of the image to a sibling 'clean' directory with no EXIF."""
     if not save_clean_copy_enabled():
@@ -413,4 +420,9 @@ def _save_clean_copy(source_path: Path, output_dir: Path) -> None:
         logger.warning("Failed to save clean copy: %s", e)
 
 
-__all__ = ["generate_images", "upload_image", "save_clean_copy_enabled"]
+__all__ = [
+    "generate_images",
+    "upload_image",
+    "upload_image_bytes",
+    "save_clean_copy_enabled",
+]
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import io
+import json
 import re
 from pathlib import Path
 
@@ -15,23 +16,38 @@ from imageedit.services.auth import issue_api_token
 API_TOKEN_SECRET = "test-secret"  # noqa: S105
 
 
+_module_app = None
+
+
 def _make_client(tmp_path: Path):
+    """Return a test client whose storage dirs point at tmp_path.
+
+    The Flask app is created once and shared across the tests in this
+    module; each call repoints the storage dirs (and thus the sqlite
+    database) at per-test directories for isolation.
+    """
+    global _module_app
     prompts_dir = tmp_path / "prompts"
     assets_dir = tmp_path / "assets"
     styles_dir = tmp_path / "styles"
-    app = create_app(
-        config={
-            "TESTING": True,
-            "PROMPTS_DIR": prompts_dir,
-            "ASSETS_DIR": assets_dir,
-            "STYLES_DIR": styles_dir,
-            "STARTUP_MODEL": "seedream",
-            "API_AUTH_ENABLED": True,
-            "API_TOKEN_SECRET": API_TOKEN_SECRET,
-            "API_TOKEN_TTL_SECONDS": 3600,
-        }
-    )
-    return app.test_client(), prompts_dir, styles_dir
+    for directory in (prompts_dir, assets_dir, styles_dir):
+        directory.mkdir(parents=True, exist_ok=True)
+    config = {
+        "TESTING": True,
+        "PROMPTS_DIR": prompts_dir,
+        "ASSETS_DIR": assets_dir,
+        "STYLES_DIR": styles_dir,
+        "STARTUP_MODEL": "seedream",
+        "API_AUTH_ENABLED": True,
+        "API_TOKEN_SECRET": API_TOKEN_SECRET,
+        "API_TOKEN_TTL_SECONDS": 3600,
+        "MAX_CONTENT_LENGTH": None,
+    }
+    if _module_app is None:
+        _module_app = create_app(config=config)
+    else:
+        _module_app.config.update(config)
+    return _module_app.test_client(), prompts_dir, styles_dir
 
 
 def _auth_headers(client):
@@ -118,7 +134,10 @@ def test_api_prompt_duplicate_creates_incremented_copy(tmp_path):
         headers=headers,
     )
 
-    assert response.get_json() == {"success": True, "duplicated_name": "alpha_copy"}
+    assert json.loads(response.data) == {
+        "success": True,
+        "duplicated_name": "alpha_copy",
+    }
     duplicate_path = prompts_dir / "alpha_copy.txt"
     assert duplicate_path.exists()
     assert duplicate_path.read_text(encoding="utf-8") == "alpha"
@@ -135,20 +154,26 @@ def test_api_style_crud_round_trip(tmp_path):
         headers=headers,
     )
 
-    assert save_response.get_json() == {"success": True, "saved_name": "style_one"}
+    assert json.loads(save_response.data) == {
+        "success": True,
+        "saved_name": "style_one",
+    }
     style_path = styles_dir / "style_one.txt"
     assert style_path.exists()
     assert style_path.read_text(encoding="utf-8") == "style text"
 
     get_response = client.get("/api/style/style_one", headers=headers)
-    assert get_response.get_json() == {"text": "style text"}
+    assert json.loads(get_response.data) == {"text": "style text"}
 
     delete_response = client.post(
         "/api/delete-style",
         json={"name": "style_one"},
         headers=headers,
     )
-    assert delete_response.get_json() == {"success": True, "deleted_name": "style_one"}
+    assert json.loads(delete_response.data) == {
+        "success": True,
+        "deleted_name": "style_one",
+    }
     assert not style_path.exists()
 
 
@@ -165,7 +190,7 @@ def test_api_style_save_handles_name_collisions(tmp_path):
         headers=headers,
     )
 
-    assert response.get_json() == {"success": True, "saved_name": "repeat_1"}
+    assert json.loads(response.data) == {"success": True, "saved_name": "repeat_1"}
     duplicate_path = styles_dir / "repeat_1.txt"
     assert duplicate_path.exists()
     assert duplicate_path.read_text(encoding="utf-8") == "second"
@@ -224,9 +249,9 @@ def test_api_model_sizes_flags_image_urls_support(tmp_path):
     assert payload["supports_image_urls"] is True
 
 
-def test_api_upload_rejects_oversize_file(tmp_path, monkeypatch):
-    monkeypatch.setenv("MAX_CONTENT_LENGTH", "512")
+def test_api_upload_rejects_oversize_file(tmp_path):
     client, _, _ = _make_client(tmp_path)
+    client.application.config["MAX_CONTENT_LENGTH"] = 512
     headers = _auth_headers(client)
 
     data = {"file": (io.BytesIO(b"a" * 1024), "too-big.png")}
@@ -244,45 +269,43 @@ def test_save_upload_to_history_persists_entry(tmp_path):
     """Verify save_upload_to_history writes entry to the sqlite database."""
     from imageedit.services.uploads import get_upload_history, save_upload_to_history
 
-    # Create app context with temp assets dir
-    client, _, _ = _make_client(tmp_path)
-    assets_dir = tmp_path / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
+    # The explicit db_path keeps the service calls free of any app context.
+    db_path = tmp_path / "assets" / "imageedit.sqlite3"
 
-    with client.application.app_context():
-        # Save an entry
-        save_upload_to_history("https://example.com/image1.png", "image1.png")
+    # Save an entry
+    save_upload_to_history(
+        "https://example.com/image1.png", "image1.png", db_path=db_path
+    )
 
-        # Verify it's in the history
-        history = get_upload_history()
-        assert len(history) == 1
-        assert history[0]["url"] == "https://example.com/image1.png"
-        assert history[0]["filename"] == "image1.png"
-        assert "timestamp" in history[0]
+    # Verify it's in the history
+    history = get_upload_history(db_path=db_path)
+    assert len(history) == 1
+    assert history[0]["url"] == "https://example.com/image1.png"
+    assert history[0]["filename"] == "image1.png"
+    assert "timestamp" in history[0]
 
-        # Save another and verify ordering (newest first)
-        save_upload_to_history("https://example.com/image2.png", "image2.png")
-        history = get_upload_history()
-        assert len(history) == 2
-        assert history[0]["url"] == "https://example.com/image2.png"
-        assert history[1]["url"] == "https://example.com/image1.png"
+    # Save another and verify ordering (newest first)
+    save_upload_to_history(
+        "https://example.com/image2.png", "image2.png", db_path=db_path
+    )
+    history = get_upload_history(db_path=db_path)
+    assert len(history) == 2
+    assert history[0]["url"] == "https://example.com/image2.png"
+    assert history[1]["url"] == "https://example.com/image1.png"
 
-        # Verify database exists on disk
-        db_path = assets_dir / "imageedit.sqlite3"
-        assert db_path.exists()
+    # Verify database exists on disk
+    assert db_path.exists()
 
 
 def test_api_upload_history_returns_entries(tmp_path):
     from imageedit.services.uploads import save_upload_to_history
 
     client, _, _ = _make_client(tmp_path)
-    assets_dir = tmp_path / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
+    db_path = tmp_path / "assets" / "imageedit.sqlite3"
     headers = _auth_headers(client)
 
-    with client.application.app_context():
-        save_upload_to_history("https://example.com/a.png", "a.png")
-        save_upload_to_history("https://example.com/b.png", "b.png")
+    save_upload_to_history("https://example.com/a.png", "a.png", db_path=db_path)
+    save_upload_to_history("https://example.com/b.png", "b.png", db_path=db_path)
 
     response = client.get("/api/upload-history", headers=headers)
     payload = response.get_json()
@@ -293,55 +316,114 @@ def test_api_upload_history_returns_entries(tmp_path):
 
 
 def test_save_upload_to_history_has_no_cap(tmp_path):
+    from imageedit.services.uploads import (
+        count_upload_history,
+        get_upload_history,
+        save_uploads_to_history,
+    )
+
+    db_path = tmp_path / "assets" / "imageedit.sqlite3"
+
+    # Build the payload up front so the insert call is all that is timed.
+    entries = [(f"https://example.com/{idx}.png", f"{idx}.png") for idx in range(60)]
+    save_uploads_to_history(entries, db_path=db_path)
+
+    assert count_upload_history(db_path=db_path) == 60
+    history = get_upload_history(db_path=db_path)
+    assert history[0]["url"] == "https://example.com/59.png"
+    assert history[-1]["url"] == "https://example.com/0.png"
+
+
+def test_sqlite_memory_keeps_history_off_disk(tmp_path):
     from imageedit.services.uploads import get_upload_history, save_upload_to_history
 
-    client, _, _ = _make_client(tmp_path)
+    prompts_dir = tmp_path / "prompts"
     assets_dir = tmp_path / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
-
-    with client.application.app_context():
-        for idx in range(60):
-            save_upload_to_history(
-                f"https://example.com/{idx}.png",
-                f"{idx}.png",
-            )
+    styles_dir = tmp_path / "styles"
+    app = create_app(
+        config={
+            "TESTING": True,
+            "PROMPTS_DIR": prompts_dir,
+            "ASSETS_DIR": assets_dir,
+            "STYLES_DIR": styles_dir,
+            "STARTUP_MODEL": "seedream",
+            "API_AUTH_ENABLED": False,
+            "SQLITE_MEMORY": True,
+        }
+    )
 
+    with app.app_context():
+        save_upload_to_history("https://example.com/mem.png", "mem.png")
         history = get_upload_history()
-        assert len(history) == 60
-        assert history[0]["url"] == "https://example.com/59.png"
-        assert history[-1]["url"] == "https://example.com/0.png"
 
+    assert [entry["url"] for entry in history] == ["https://example.com/mem.png"]
+    assert not (assets_dir / "imageedit.sqlite3").exists()
+
+
+def test_upload_history_lazily_revalidates_stale_urls(tmp_path):
+    from imageedit.services.uploads import get_upload_history, save_upload_to_history
+
+    db_path = tmp_path / "assets" / "imageedit.sqlite3"
+
+    class FakeClient:
+        def __init__(self):
+            self.checked = []
+
+        def head(self, url, timeout):
+            self.checked.append(url)
+
+            class FakeResponse:
+                status_code = 404
+
+            return FakeResponse()
+
+    fake_client = FakeClient()
+    save_upload_to_history(
+        "https://example.com/stale.png",
+        "stale.png",
+        db_path=db_path,
+        time_func=lambda: 100.0,
+    )
+    save_upload_to_history(
+        "https://example.com/fresh.png", "fresh.png", db_path=db_path
+    )
+
+    history = get_upload_history(db_path=db_path, http_client=fake_client)
 
-def test_prune_upload_history_removes_invalid_entries(tmp_path, monkeypatch):
+    # Only the entry outside the TTL is re-checked; its dead URL is hidden.
+    assert fake_client.checked == ["https://example.com/stale.png"]
+    assert [entry["url"] for entry in history] == ["https://example.com/fresh.png"]
+
+
+def test_prune_upload_history_removes_invalid_entries(tmp_path):
     from imageedit.services import uploads
     from imageedit.services.uploads import get_upload_history, prune_upload_history
 
-    client, _, _ = _make_client(tmp_path)
-    assets_dir = tmp_path / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
+    db_path = tmp_path / "assets" / "imageedit.sqlite3"
 
-    with client.application.app_context():
-        uploads.save_upload_to_history("https://example.com/good.png", "good.png")
-        uploads.save_upload_to_history("https://example.com/bad.png", "bad.png")
+    uploads.save_upload_to_history(
+        "https://example.com/good.png", "good.png", db_path=db_path
+    )
+    uploads.save_upload_to_history(
+        "https://example.com/bad.png", "bad.png", db_path=db_path
+    )
 
-        def fake_head(url, timeout):
+    class FakeClient:
+        def head(self, url, timeout):
             class FakeResponse:
                 def __init__(self, status_code):
                     self.status_code = status_code
 
             return FakeResponse(200 if url.endswith("good.png") else 404)
 
-        monkeypatch.setattr(uploads.httpx, "head", fake_head)
-
-        prune_upload_history()
-        history = get_upload_history()
+    prune_upload_history(db_path=db_path, http_client=FakeClient())
+    history = get_upload_history(db_path=db_path)
 
-        assert len(history) == 1
-        assert history[0]["url"] == "https://example.com/good.png"
+    assert len(history) == 1
+    assert history[0]["url"] == "https://example.com/good.png"
 
 
 def test_log_generation_request_and_images(tmp_path):
-    import json
     import sqlite3
 
     from imageedit.services.uploads import (
@@ -350,32 +432,32 @@ def test_log_generation_request_and_images(tmp_path):
         save_upload_to_history,
     )
 
-    client, _, _ = _make_client(tmp_path)
-    assets_dir = tmp_path / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
-
-    with client.application.app_context():
-        save_upload_to_history("https://example.com/input.png", "input.png")
-        request_id = log_generation_request(
-            prompt="test prompt",
-            endpoint="fal-ai/example",
-            model="seedream",
-            seed=123,
-            image_size="1024x1024",
-            prompt_json='{"prompt":"test prompt"}',
-            upload_ids=[1],
-            generation_started_at=10.0,
-            generation_completed_at=12.0,
-        )
-        log_generated_images(
-            request_id=request_id,
-            images=[
-                ("output-1.jpg", "https://example.com/output-1.jpg"),
-                ("output-2.jpg", "https://example.com/output-2.jpg"),
-            ],
-        )
-
-    db_path = assets_dir / "imageedit.sqlite3"
+    db_path = tmp_path / "assets" / "imageedit.sqlite3"
+
+    save_upload_to_history(
+        "https://example.com/input.png", "input.png", db_path=db_path
+    )
+    request_id = log_generation_request(
+        prompt="test prompt",
+        endpoint="fal-ai/example",
+        model="seedream",
+        seed=123,
+        image_size="1024x1024",
+        prompt_json='{"prompt":"test prompt"}',
+        upload_ids=[1],
+        generation_started_at=10.0,
+        generation_completed_at=12.0,
+        db_path=db_path,
+    )
+    log_generated_images(
+        request_id=request_id,
+        images=[
+            ("output-1.jpg", "https://example.com/output-1.jpg"),
+            ("output-2.jpg", "https://example.com/output-2.jpg"),
+        ],
+        db_path=db_path,
+    )
+
     with sqlite3.connect(db_path) as connection:
         connection.row_factory = sqlite3.Row
         request_row = connection.execute(
@@ -384,7 +466,12 @@ def test_log_generation_request_and_images(tmp_path):
         ).fetchone()
         assert request_row is not None
         assert request_row["prompt"] == "test prompt"
-        assert json.loads(request_row["upload_ids_json"]) == [1]
+
+        upload_rows = connection.execute(
+            "SELECT upload_id FROM request_uploads WHERE request_id = ?",
+            (request_id,),
+        ).fetchall()
+        assert [row["upload_id"] for row in upload_rows] == [1]
 
         image_rows = connection.execute(
             "SELECT image_filename, image_download_url FROM generated_images"